@@ -1,39 +1,225 @@
+import functools
 import json
 import os
+import pickle
+import re
 import shlex
 import subprocess
-from collections import defaultdict
+import sys
+import tempfile
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 import click
 
+try:
+    from orjson import loads as _json_loads  # type: ignore[import-not-found]
+except ImportError:
+    # orjson is an optional speedup; the stdlib parser accepts bytes as well
+    _json_loads = json.loads  # type: ignore[assignment]
 
-def is_overdue_or_due_today(task: Dict) -> Optional[str]:
-    """Check if task is overdue or due today. Returns 'overdue', 'due_today', or None."""
-    if "due" not in task:
-        return None
 
-    try:
-        # Parse due date from taskwarrior ISO format
-        due_date = datetime.fromisoformat(task["due"].replace("Z", "+00:00"))
-        now = datetime.now(timezone.utc)
+# Taskwarrior exports dates in the fixed-width UTC form 20240131T235959Z, which
+# sorts lexically in time order
+_TASK_DATE_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+def _is_task_date(value: object) -> bool:
+    """Return whether value is in taskwarrior's own date format.
+
+    Such dates compare correctly as plain strings, which is used as a fast path
+    before falling back to parsing.
+    """
+    return (
+        isinstance(value, str)
+        and len(value) == 16
+        and value[8] == "T"
+        and value[15] == "Z"
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_task_date(value: str) -> datetime:
+    """Parse a taskwarrior ISO date, memoized since many tasks share one."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
-        # Get start of today in UTC
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
 
-        if due_date < now:
+def is_overdue_or_due_today(task: Dict, now_iso: str) -> Optional[str]:
+    """Check if task is overdue or due today. Returns 'overdue', 'due_today', or None.
+
+    `now_iso` is the current UTC time in taskwarrior's date format, computed
+    once per command by the caller.
+    """
+    due = task.get("due")
+    if due is None:
+        return None
+
+    if _is_task_date(due):
+        if due < now_iso:
             return "overdue"
-        elif today_start <= due_date <= today_end:
+        elif due[:8] == now_iso[:8]:
             return "due_today"
         else:
             return None
-    except (ValueError, AttributeError):
+
+    try:
+        due_date = _parse_task_date(due)
+        if due_date < _parse_task_date(now_iso):
+            return "overdue"
+        elif due_date.astimezone(timezone.utc).strftime("%Y%m%d") == now_iso[:8]:
+            return "due_today"
+        else:
+            return None
+    except (ValueError, AttributeError, TypeError):
         return None
 
 
+def is_waiting_task(task: Dict, now_iso: str) -> bool:
+    """Check if task matches taskwarrior's +WAITING tag (a wait date still ahead).
+
+    Older taskwarrior versions export such tasks with status "waiting", newer
+    ones keep them "pending" with a future `wait`, so both are accepted.
+    """
+    if task.get("status") == "waiting":
+        return True
+    wait = task.get("wait")
+    if wait is None:
+        return False
+
+    if _is_task_date(wait):
+        return wait > now_iso
+
+    try:
+        return _parse_task_date(wait) > _parse_task_date(now_iso)
+    except (ValueError, AttributeError, TypeError):
+        return False
+
+
+# Format templates producing the same escape sequences as click.style for the
+# styles used when rendering tasks. Formatting them directly avoids a
+# click.style call per rendered line.
+_ANSI_STYLES: Dict[str, str] = {
+    "active": "\x1b[92m\x1b[1m{}\x1b[0m",  # bright_green, bold
+    "due": "\x1b[34m{}\x1b[0m",  # blue
+    "dim": "\x1b[90m{}\x1b[0m",  # bright_black
+    "high": "\x1b[91m\x1b[1m{}\x1b[0m",  # bright_red, bold
+    "cycle": "\x1b[33m{}\x1b[0m",  # yellow
+    "root": "\x1b[36m\x1b[1m{}\x1b[0m",  # cyan, bold
+}
+_PLAIN_STYLES: Dict[str, str] = {name: "{}" for name in _ANSI_STYLES}
+
+
+def _color_enabled() -> bool:
+    """Return whether the current command should emit ANSI colors.
+
+    Mirrors click's own decision: an explicit color setting on the context
+    wins, otherwise colors are only emitted when stdout is a terminal.
+    """
+    ctx = click.get_current_context(silent=True)
+    color = ctx.color if ctx is not None else None
+    if color is None:
+        color = sys.stdout.isatty()
+    return color
+
+
+def _style_templates() -> Dict[str, str]:
+    """Return the style templates to render with for the current command."""
+    return _ANSI_STYLES if _color_enabled() else _PLAIN_STYLES
+
+
+# Priority order: H > M > L > None; unknown values sort below all of them
+_PRIORITY_ORDER: Dict[str, int] = {"H": 4, "M": 3, "L": 2, "": 1}
+
+
+def _task_sort_key(task: Dict) -> Tuple[int, float]:
+    """Return the (priority, urgency) sort key for a task."""
+    priority = task.get("priority", "")
+    # Taskwarrior always exports urgency as a number; treat anything else as 0
+    urgency = task.get("urgency", 0)
+    if not isinstance(urgency, (int, float)):
+        urgency = 0.0
+    return (_PRIORITY_ORDER.get(priority, 0), urgency)
+
+
+def _strongly_connected_components(edges: Sequence[Sequence[int]]) -> List[List[int]]:
+    """Return the strongly connected components of a directed graph.
+
+    Nodes are the integers 0..len(edges)-1 and `edges[n]` lists the successors
+    of node `n`. Uses Tarjan's algorithm, driven by an explicit stack so long
+    dependency chains cannot hit the recursion limit.
+    """
+    node_count = len(edges)
+    index = [-1] * node_count
+    lowlink = [0] * node_count
+    on_stack = bytearray(node_count)
+    stack: List[int] = []
+    components: List[List[int]] = []
+    next_index = 0
+
+    for start in range(node_count):
+        if index[start] >= 0:
+            continue
+        index[start] = lowlink[start] = next_index
+        next_index += 1
+        stack.append(start)
+        on_stack[start] = 1
+        work: List[Tuple[int, Iterator[int]]] = [(start, iter(edges[start]))]
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if index[successor] < 0:
+                    index[successor] = lowlink[successor] = next_index
+                    next_index += 1
+                    stack.append(successor)
+                    on_stack[successor] = 1
+                    work.append((successor, iter(edges[successor])))
+                    break
+                if on_stack[successor]:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                # All successors done: propagate lowlink and pop a finished component
+                work.pop()
+                if work:
+                    caller = work[-1][0]
+                    lowlink[caller] = min(lowlink[caller], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component: List[int] = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def _distinct_by_cycle(
+    nodes: Iterable[int], cycle_of: Sequence[Optional[List[int]]]
+) -> List[int]:
+    """Drop repeated nodes, keeping only the first member of each cycle seen.
+
+    A collapsed cycle is a single node in the tree, so its members count as
+    one. Order is preserved.
+    """
+    distinct: Dict[int, int] = {}
+    for node in nodes:
+        node_cycle = cycle_of[node]
+        distinct.setdefault(node if node_cycle is None else node_cycle[0], node)
+    return list(distinct.values())
+
+
 def _detect_context_via_task_cli() -> Optional[str]:
     """Attempt to read the active context using the task CLI."""
     try:
@@ -50,56 +236,115 @@ def _detect_context_via_task_cli() -> Optional[str]:
     return context or None
 
 
-def _expand_include_path(include_path: str, base_path: Path) -> Path:
+# Matches the taskrc lines relevant to contexts in a single scan of the file:
+# `include <path>`, `context.<key>=<filter>` and `context=<name>`. Comment lines
+# and all other settings never match, and values stop at a trailing `#` comment
+# like taskwarrior's own parser.
+_TASKRC_LINE_RE = re.compile(
+    r"""
+    ^[ \t]*
+    (?:
+        (?i:include)[ \t]+(?P<include>[^\#\n]*)
+      | context\.(?P<key>[^=\n]*)=(?P<value>[^\#\n]*)
+      | context[ \t]*=(?P<active>[^\#\n]*)
+    )
+    """,
+    re.MULTILINE | re.VERBOSE,
+)
+
+
+# Recorded in the taskrc cache key for files that could not be read, so the
+# cache is invalidated once they appear or become readable
+_MISSING_MTIME = -1
+
+# An `include` line as recorded in the taskrc cache key: the value as written,
+# the file containing it, the path it expanded to, and that path's fingerprint
+_IncludeRecord = Tuple[str, str, str, Tuple[str, int]]
+
+
+def _expand_include_path(include_path: str, base_path: str) -> str:
     """Resolve include path relative to base file, expanding user and env vars."""
-    expanded = os.path.expandvars(include_path.strip().strip('"\''))
-    candidate = Path(expanded).expanduser()
-    if candidate.is_absolute():
-        return candidate
-    return (base_path.parent / candidate).resolve()
+    expanded = os.path.expanduser(os.path.expandvars(include_path.strip().strip('"\'')))
+    if os.path.isabs(expanded):
+        return expanded
+    # Symlinks are resolved when the include is opened, so a plain join is
+    # enough here
+    return os.path.join(os.path.dirname(base_path), expanded)
+
+
+def _file_fingerprint(path: str) -> Tuple[str, int]:
+    """Return the file a path currently resolves to and its mtime.
+
+    Resolving follows every symlink hop, so retargeting a link changes the
+    fingerprint even when both targets share an mtime (as in the Nix store).
+    Unreadable files get `_MISSING_MTIME`.
+    """
+    resolved = os.path.realpath(path)
+    try:
+        mtime = os.stat(resolved).st_mtime_ns
+    except OSError:
+        return resolved, _MISSING_MTIME
+    if not os.access(resolved, os.R_OK):
+        return resolved, _MISSING_MTIME
+    return resolved, mtime
 
 
 def _parse_taskrc_for_contexts(
-    path: Path, visited: Set[Path]
+    path: str, visited: Set[Tuple[int, int]], includes: List[_IncludeRecord]
 ) -> Tuple[Optional[str], Dict[str, str]]:
     """Recursively parse Taskwarrior rc files for the active context and definitions.
 
     Supports both `context.<name>=...` and `context.<name>.read/.write=...` forms.
     When both read/write exist, the returned filter is `.read` since the tree
     command performs a read-only listing.
+
+    `visited` holds the (device, inode) of every file read, so a file reached
+    through several links or includes is parsed once. Every `include` line met,
+    including ones that point at missing files, is appended to `includes`.
     """
     try:
-        resolved_path = path.resolve()
-    except FileNotFoundError:
+        st = os.stat(path)
+    except OSError:
         return None, {}
 
-    if resolved_path in visited or not resolved_path.exists():
+    file_id = (st.st_dev, st.st_ino)
+    if file_id in visited:
         return None, {}
 
-    visited.add(resolved_path)
-
+    resolved = os.path.realpath(path)
     try:
-        contents = resolved_path.read_text(encoding="utf-8").splitlines()
+        with open(resolved, "rb") as f:
+            raw = f.read()
     except OSError:
         return None, {}
 
+    visited.add(file_id)
+    contents = raw.decode("utf-8", "replace")
+
     active_context: Optional[str] = None
     # Track possibly separate read/write filters per context name
     read_filters: Dict[str, str] = {}
     write_filters: Dict[str, str] = {}
     generic_filters: Dict[str, str] = {}
 
-    for raw_line in contents:
-        line = raw_line.strip()
-        if not line or line.startswith("#"):
-            continue
+    for match in _TASKRC_LINE_RE.finditer(contents):
+        include_part, key, value, active_value = match.groups()
 
-        if line.lower().startswith("include"):
-            _, _, include_part = line.partition(" ")
+        if include_part is not None:
             if include_part:
-                include_path = _expand_include_path(include_part, resolved_path)
+                include_path = _expand_include_path(include_part, resolved)
+                # Fingerprint before reading, so a change while parsing is
+                # caught on the next run
+                includes.append(
+                    (
+                        include_part,
+                        resolved,
+                        include_path,
+                        _file_fingerprint(include_path),
+                    )
+                )
                 nested_active, nested_definitions = _parse_taskrc_for_contexts(
-                    include_path, visited
+                    include_path, visited, includes
                 )
                 if nested_active is not None:
                     active_context = nested_active
@@ -109,46 +354,31 @@ def _parse_taskrc_for_contexts(
                         generic_filters[_name] = _filter
             continue
 
-        if line.startswith("context."):
-            key, _, value = line.partition("=")
+        if key is not None:
             if not value:
                 continue
-            rhs = value.split("#", 1)[0].strip()
-            # key looks like: context.NAME or context.NAME.read/write
-            key_body = key[len("context.") :].strip()
+            rhs = value.strip()
+            # key looks like: NAME or NAME.read/write
+            key_body = key.strip()
             if not key_body:
                 continue
+            # Use the first part as name and the last as mode, so unexpected
+            # extra dots are tolerated
             parts = key_body.split(".")
-            if len(parts) == 1:
-                context_name = parts[0]
-                generic_filters[context_name] = rhs
-            elif len(parts) == 2:
-                context_name, mode = parts
-                mode = mode.lower()
-                if mode == "read":
-                    read_filters[context_name] = rhs
-                elif mode == "write":
-                    write_filters[context_name] = rhs
-                else:
-                    # Unknown suffix, treat it as generic
-                    generic_filters[context_name] = rhs
+            context_name = parts[0]
+            mode = parts[-1].lower() if len(parts) > 1 else ""
+            if mode == "read":
+                read_filters[context_name] = rhs
+            elif mode == "write":
+                write_filters[context_name] = rhs
             else:
-                # Unexpected extra dots; use the first as name and last as mode
-                context_name = parts[0]
-                mode = parts[-1].lower()
-                if mode == "read":
-                    read_filters[context_name] = rhs
-                elif mode == "write":
-                    write_filters[context_name] = rhs
-                else:
-                    generic_filters[context_name] = rhs
+                # No suffix or an unknown one, treat it as generic
+                generic_filters[context_name] = rhs
             continue
 
-        if line.startswith("context") and not line.startswith("context."):
-            _, _, value = line.partition("=")
-            context_value = value.split("#", 1)[0].strip()
-            if context_value:
-                active_context = context_value
+        context_value = active_value.strip()
+        if context_value:
+            active_context = context_value
 
     # Merge into a single mapping preferring read > generic > write
     merged: Dict[str, str] = {}
@@ -165,40 +395,120 @@ def _parse_taskrc_for_contexts(
 
 def _taskrc_path() -> Optional[Path]:
     """Return the primary taskrc file location if it exists."""
-    candidates: List[Path] = []
+    candidates: List[str] = []
     taskrc_env = os.environ.get("TASKRC")
     if taskrc_env:
-        candidates.append(Path(taskrc_env).expanduser())
+        candidates.append(os.path.expanduser(taskrc_env))
 
-    home = Path.home()
+    home = os.path.expanduser("~")
     candidates.extend(
         [
-            home / ".taskrc",
-            home / ".config" / "task" / "taskrc",
+            os.path.join(home, ".taskrc"),
+            os.path.join(home, ".config", "task", "taskrc"),
         ]
     )
 
     for candidate in candidates:
-        expanded = candidate.expanduser()
-        if expanded.exists():
-            try:
-                return expanded.resolve()
-            except FileNotFoundError:
-                continue
+        if os.path.isfile(candidate):
+            return Path(os.path.realpath(candidate))
     return None
 
 
-def detect_active_context() -> Tuple[Optional[str], Optional[str]]:
-    """Detect the active Taskwarrior context and its filter definition."""
-    context = _detect_context_via_task_cli()
+def _taskrc_cache_path() -> Path:
+    """Return the location of the on-disk parsed taskrc cache."""
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = Path(cache_home).expanduser() if cache_home else Path.home() / ".cache"
+    return base / "taskwarrior-enhanced" / "taskrc.cache"
+
+
+def _read_taskrc_cache(
+    taskrc: str,
+) -> Optional[Tuple[Optional[str], Dict[str, str]]]:
+    """Load cached contexts for taskrc if none of its files changed since."""
+    # The cache is best-effort: a missing, corrupt or foreign file (unpickling
+    # can raise nearly anything) is treated as a miss
+    try:
+        with _taskrc_cache_path().open("rb") as f:
+            cached_root, (root_fingerprint, includes), active_context, merged = (
+                pickle.load(f)
+            )
+
+        if cached_root != taskrc or not isinstance(merged, dict):
+            return None
+        if _file_fingerprint(taskrc) != root_fingerprint:
+            return None
+
+        # Re-expand every include as written, so a changed environment variable
+        # is noticed, then check the file it now points at
+        for include_part, base_path, include_path, fingerprint in includes:
+            if _expand_include_path(include_part, base_path) != include_path:
+                return None
+            if _file_fingerprint(include_path) != fingerprint:
+                return None
+    except Exception:
+        return None
+
+    return active_context, merged
+
+
+def _write_taskrc_cache(
+    taskrc: str,
+    root_fingerprint: Tuple[str, int],
+    includes: List[_IncludeRecord],
+    active_context: Optional[str],
+    merged: Dict[str, str],
+) -> None:
+    """Atomically store parsed contexts alongside the files they came from."""
+    cache_path = _taskrc_cache_path()
+    # The fingerprints were taken while parsing, so no file is stat'd again here
+    stat_key = (root_fingerprint, tuple(includes))
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=cache_path.parent, prefix=".taskrc.", delete=False
+        ) as f:
+            pickle.dump((taskrc, stat_key, active_context, merged), f)
+        os.replace(f.name, cache_path)
+    except OSError:
+        # Caching is best-effort; a failed write only costs a re-parse next run
+        pass
+
+
+def _load_taskrc_contexts(path: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """Parse a taskrc for contexts, going through the on-disk cache.
+
+    The cache is reused across runs as long as the taskrc and all of its
+    includes expand to the same files with the same mtimes.
+    """
+    cached = _read_taskrc_cache(path)
+    if cached is not None:
+        return cached
+
+    root_fingerprint = _file_fingerprint(path)
+    includes: List[_IncludeRecord] = []
+    active_context, merged = _parse_taskrc_for_contexts(path, set(), includes)
+    _write_taskrc_cache(path, root_fingerprint, includes, active_context, merged)
+    return active_context, merged
+
+
+@functools.lru_cache(maxsize=4)
+def _resolve_active_context(
+    taskrc: Optional[str], mtime_ns: Optional[int]
+) -> Tuple[Optional[str], Optional[str]]:
+    """Resolve the active context for a taskrc, memoized on its path and mtime.
+
+    The taskrc is read first; the task CLI is only consulted when the rc file
+    neither sets an active context nor defines any.
+    """
     context_filters: Dict[str, str] = {}
     config_context: Optional[str] = None
+    if taskrc is not None:
+        config_context, context_filters = _load_taskrc_contexts(taskrc)
 
-    taskrc = _taskrc_path()
-    if taskrc:
-        config_context, context_filters = _parse_taskrc_for_contexts(taskrc, set())
+    active_context = config_context
+    if active_context is None and not context_filters:
+        active_context = _detect_context_via_task_cli()
 
-    active_context = context or config_context
     filter_definition = None
     if active_context:
         filter_definition = context_filters.get(active_context)
@@ -206,6 +516,37 @@ def detect_active_context() -> Tuple[Optional[str], Optional[str]]:
     return active_context, filter_definition
 
 
+def detect_active_context() -> Tuple[Optional[str], Optional[str]]:
+    """Detect the active Taskwarrior context and its filter definition."""
+    taskrc = _taskrc_path()
+    if taskrc:
+        try:
+            mtime_ns = taskrc.stat().st_mtime_ns
+        except OSError:
+            pass
+        else:
+            return _resolve_active_context(str(taskrc), mtime_ns)
+    return _resolve_active_context(None, None)
+
+
+@functools.lru_cache(maxsize=16)
+def _tokenize_filter(context_filter: str) -> Tuple[str, ...]:
+    """Split a context filter into `task` arguments, caching the result."""
+    return tuple(shlex.split(context_filter))
+
+
+def _context_task_command() -> Tuple[List[str], Optional[str]]:
+    """Return the base `task` command for the active context and its name."""
+    task_cmd: List[str] = ["task"]
+    context_name, context_filter = detect_active_context()
+    if context_name:
+        if context_filter:
+            task_cmd.extend(_tokenize_filter(context_filter))
+        else:
+            task_cmd.append(f"rc.context={context_name}")
+    return task_cmd, context_name
+
+
 @click.group()
 def cli() -> None:
     """Taskwarrior Enhanced - Companion CLI for taskwarrior"""
@@ -217,178 +558,255 @@ def cli() -> None:
 def tree(filters: Tuple[str, ...]) -> None:
     """Display pending tasks in a dependency tree format"""
 
+    # All output is collected here and written once at the end
+    lines: List[str] = []
+
     # Build task command with filters
-    task_cmd: List[str] = ["task"]
-    context_name, context_filter = detect_active_context()
+    task_cmd, context_name = _context_task_command()
     if context_name:
         # Minimal, user-friendly log
-        click.echo(f"Context: {context_name}")
-        if context_filter:
-            context_args = shlex.split(context_filter)
-            task_cmd.extend(context_args)
-        else:
-            task_cmd.append(f"rc.context={context_name}")
+        lines.append(f"Context: {context_name}")
 
-    # Fetch both pending and waiting tasks
-    pending_cmd = task_cmd + ["+PENDING"]
-    waiting_cmd = task_cmd + ["+WAITING"]
-    if filters:
-        pending_cmd.extend(filters)
-        waiting_cmd.extend(filters)
-    pending_cmd.append("export")
-    waiting_cmd.append("export")
+    # Fetch pending and waiting tasks in a single export
+    export_cmd = task_cmd + ["(", "+PENDING", "or", "+WAITING", ")"]
+    export_cmd.extend(filters)
+    export_cmd.append("export")
 
     try:
-        pending_result = subprocess.run(
-            pending_cmd, capture_output=True, text=True, check=True
-        )
-        pending_tasks = json.loads(pending_result.stdout)
-
-        waiting_result = subprocess.run(
-            waiting_cmd, capture_output=True, text=True, check=True
-        )
-        waiting_tasks = json.loads(waiting_result.stdout)
+        # Keep the output as bytes so the JSON parser can skip a decode pass
+        result = subprocess.run(export_cmd, capture_output=True, check=True)
+        tasks_data: List[Dict] = _json_loads(result.stdout)
     except subprocess.CalledProcessError as e:
+        # Flush the context header first so the error shows which filter was used
+        if lines:
+            click.echo("\n".join(lines))
         click.echo("Error: Failed to run task export", err=True)
         click.echo(f"Return code: {e.returncode}", err=True)
-        click.echo(f"stderr: {e.stderr}", err=True)
-        click.echo(f"stdout: {e.stdout}", err=True)
+        click.echo(f"stderr: {e.stderr.decode('utf-8', 'replace')}", err=True)
+        click.echo(f"stdout: {e.stdout.decode('utf-8', 'replace')}", err=True)
         return
     except FileNotFoundError:
+        if lines:
+            click.echo("\n".join(lines))
         click.echo(
             "Error: 'task' command not found. Is taskwarrior installed?", err=True
         )
         return
     except json.JSONDecodeError:
+        if lines:
+            click.echo("\n".join(lines))
         click.echo("Error: Failed to parse task export output", err=True)
         return
 
-    # Track waiting task UUIDs for styling
-    waiting_uuids: Set[str] = {task["uuid"] for task in waiting_tasks}
-
-    # Merge tasks (pending first, then add waiting tasks not already present)
-    seen_uuids: Set[str] = set()
-    tasks_data: List[Dict] = []
-    for task in pending_tasks:
-        if task["uuid"] not in seen_uuids:
-            seen_uuids.add(task["uuid"])
-            tasks_data.append(task)
-    for task in waiting_tasks:
-        if task["uuid"] not in seen_uuids:
-            seen_uuids.add(task["uuid"])
-            tasks_data.append(task)
-
     if not tasks_data:
-        click.echo("No pending or waiting tasks found.")
+        lines.append("No pending or waiting tasks found.")
+        click.echo("\n".join(lines))
         return
 
-    # Build task lookup and dependency maps
-    tasks = {task["uuid"]: task for task in tasks_data}
-    children = defaultdict(list)  # parent_uuid -> [child_uuids]
-    parents = defaultdict(list)  # child_uuid -> [parent_uuids]
+    # Reference time for due date and wait styling, shared by every task
+    now_iso = datetime.now(timezone.utc).strftime(_TASK_DATE_FORMAT)
+
+    # Number tasks densely by their position in the export. The graph, sort keys
+    # and per-task flags below are plain lists and bytearrays indexed by these
+    # numbers, so the traversal does no uuid hashing. Sort keys are computed
+    # once per task rather than on every comparison.
+    task_count = len(tasks_data)
+    index_of: Dict[str, int] = {}
+    sort_keys: List[Tuple[int, float]] = []
+    is_waiting = bytearray(task_count)  # for styling
+    for i, task in enumerate(tasks_data):
+        index_of[task["uuid"]] = i
+        sort_keys.append(_task_sort_key(task))
+        if is_waiting_task(task, now_iso):
+            is_waiting[i] = 1
+
+    # Build dependency maps
+    children: List[List[int]] = [[] for _ in range(task_count)]
+    parents: List[List[int]] = [[] for _ in range(task_count)]
+
+    # Whether any task has several parents; without one the multiple parents
+    # indicator can never show and its per-node work is skipped
+    has_multi_parent = False
 
     # Build dependency relationships
     # For display purposes: task with 'depends' is the parent, dependencies are children
     # This shows what needs to be done before the main task can be completed
-    for task in tasks_data:
-        if "depends" in task:
-            for dependency_uuid in task["depends"]:
-                if dependency_uuid in tasks:  # Only include pending dependencies
-                    # task['uuid'] is the parent, dependency_uuid is the child
-                    children[task["uuid"]].append(dependency_uuid)
-                    parents[dependency_uuid].append(task["uuid"])
+    for i, task in enumerate(tasks_data):
+        depends = task.get("depends")
+        if not depends:
+            continue
+        for dependency_uuid in depends:
+            j = index_of.get(dependency_uuid)
+            if j is not None:  # Only include pending dependencies
+                # task i is the parent, dependency j is the child
+                children[i].append(j)
+                if parents[j]:
+                    has_multi_parent = True
+                parents[j].append(i)
+
+    # Sort children by priority first, then urgency (both descending), once up
+    # front so the traversal can use them as-is. Tuples are smaller than lists
+    # and make it explicit that the traversal never reorders them.
+    sort_key = sort_keys.__getitem__
+    sorted_children: List[Tuple[int, ...]] = [
+        tuple(sorted(child_list, key=sort_key, reverse=True)) for child_list in children
+    ]
+
+    # Collapse dependency cycles: every strongly connected component with more
+    # than one task (or a task depending on itself) is rendered as one node
+    cycles: List[List[int]] = []
+    cycle_of: List[Optional[List[int]]] = [None] * task_count
+    for component in _strongly_connected_components(sorted_children):
+        if len(component) == 1 and component[0] not in children[component[0]]:
+            continue
+        component.sort(key=sort_key, reverse=True)
+        cycles.append(component)
+        for member in component:
+            cycle_of[member] = component
 
     # Find root tasks (tasks that are not children of any other task)
-    # These are tasks that other tasks depend on, but don't depend on anything themselves
-    roots = []
-    all_children = set()
-    for child_list in children.values():
-        all_children.update(child_list)
+    # These are tasks that other tasks depend on, but don't depend on anything
+    # themselves.
+    roots = [i for i in range(task_count) if not parents[i]]
 
-    for task in tasks_data:
-        task_uuid = task["uuid"]
-        if task_uuid not in all_children:
-            roots.append(task_uuid)
+    # Cycle members all have parents, so a cycle not reachable from any outside
+    # task is entered through its first member instead
+    for cycle in cycles:
+        if all(cycle_of[p] is cycle for member in cycle for p in parents[member]):
+            roots.append(cycle[0])
 
     # Sort roots by priority first, then urgency (both descending) for consistent output
-    def get_sort_key(uuid: str) -> Tuple[int, float]:
-        task = tasks[uuid]
-        priority = task.get("priority", "")
-        urgency_value = task.get("urgency", 0)
-        try:
-            urgency = float(urgency_value)
-        except (TypeError, ValueError):
-            urgency = 0.0
-        # Priority order: H > M > L > None, then by urgency
-        priority_order = {"H": 4, "M": 3, "L": 2, "": 1}
-        return (priority_order.get(priority, 0), urgency)
-
-    roots.sort(key=get_sort_key)
-
-    # Print the tree
-    visited = set()
-
-    def print_tree(
-        task_uuid: str,
-        prefix: str = "",
-        is_last: bool = True,
-        current_parent: str | None = None,
-    ) -> None:
-        if task_uuid in visited:
-            return
-        visited.add(task_uuid)
+    roots.sort(key=sort_key, reverse=True)
 
-        task = tasks[task_uuid]
-        task_id = task.get("id", "?")
-        description = task["description"]
-        priority = task.get("priority", "")
+    styles = _style_templates()
+
+    # Print the tree depth-first using an explicit stack
+    visited = bytearray(task_count)
+
+    # Stack entries: (task index, prefix, is_last, current parent index or -1)
+    stack: List[Tuple[int, str, bool, int]] = [
+        (root, "", i == len(roots) - 1, -1)
+        for i, root in reversed(list(enumerate(roots)))
+    ]
+    while stack:
+        node, prefix, is_last, current_parent = stack.pop()
+        if visited[node]:
+            continue
 
-        # Add multiple parents indicator (styled grey), excluding current parent
-        task_parents = parents.get(task_uuid, [])
-        other_parents = [p for p in task_parents if p != current_parent]
+        node_cycle = cycle_of[node]
+        task_parents: Sequence[int]
+        task_children: Sequence[int]
+        if node_cycle is None:
+            visited[node] = 1
+
+            task = tasks_data[node]
+            task_id = task.get("id", "?")
+            description = task["description"]
+            priority = task.get("priority", "")
+
+            task_content = f"{task_id} {description}"
+
+            # Color based on priority, active status, due dates, and waiting status
+            is_active = "start" in task
+            due_status = is_overdue_or_due_today(task, now_iso)
+
+            if is_active:
+                task_content = styles["active"].format(task_content)
+            elif due_status in ("overdue", "due_today"):
+                task_content = styles["due"].format(task_content)
+            elif is_waiting[node] or priority == "L":
+                task_content = styles["dim"].format(task_content)
+            elif priority == "H":
+                task_content = styles["high"].format(task_content)
+
+            task_parents = parents[node]
+            task_children = sorted_children[node]
+            if cycles:
+                # Several dependencies inside one cycle lead to the same node
+                task_children = _distinct_by_cycle(task_children, cycle_of)
+        else:
+            # Render the whole cycle once, starting from the member we entered by
+            for member in node_cycle:
+                visited[member] = 1
+            cycle_path = [node]
+            while True:
+                next_member = next(
+                    (
+                        c
+                        for c in sorted_children[cycle_path[-1]]
+                        if cycle_of[c] is node_cycle and c not in cycle_path
+                    ),
+                    None,
+                )
+                if next_member is None:
+                    break
+                cycle_path.append(next_member)
+            if len(cycle_path) == len(node_cycle) and node in children[cycle_path[-1]]:
+                # The walk went through every member and closes the loop
+                cycle_path.append(node)
+                separator = "→"
+            else:
+                # No simple loop was found, so list every member instead of
+                # drawing edges that do not exist
+                cycle_path = node_cycle
+                separator = ","
+            cycle_ids = separator.join(
+                str(tasks_data[member].get("id", "?")) for member in cycle_path
+            )
+            task_content = styles["cycle"].format(f"⟳ cycle: {cycle_ids}")
+
+            # Edges into and out of the cycle belong to the collapsed node
+            task_parents = [
+                p
+                for member in node_cycle
+                for p in parents[member]
+                if cycle_of[p] is not node_cycle
+            ]
+            task_children = _distinct_by_cycle(
+                sorted(
+                    (
+                        c
+                        for member in node_cycle
+                        for c in sorted_children[member]
+                        if cycle_of[c] is not node_cycle
+                    ),
+                    key=sort_key,
+                    reverse=True,
+                ),
+                cycle_of,
+            )
+
+        # Add multiple parents indicator (styled grey), excluding current parent.
+        # A parent inside a cycle stands for the whole collapsed cycle node.
+        # A lone parent is always the one we are printed under, so only nodes
+        # with several parents can show the indicator.
         multi_parent_prefix = ""
-        if other_parents:
-            parent_ids = [
-                tasks[parent_uuid].get("id", "?") for parent_uuid in other_parents
+        if has_multi_parent and len(task_parents) > 1:
+            current_cycle = cycle_of[current_parent] if current_parent >= 0 else None
+            other_parents = [
+                p
+                for p in _distinct_by_cycle(task_parents, cycle_of)
+                if p != current_parent
+                and (current_cycle is None or cycle_of[p] is not current_cycle)
             ]
-            parent_ids_str = ",".join(map(str, parent_ids))
-            multi_parent_prefix = click.style(f" [{parent_ids_str}]", fg="bright_black")
+            if other_parents:
+                parent_ids = [tasks_data[p].get("id", "?") for p in other_parents]
+                parent_ids_str = ",".join(map(str, parent_ids))
+                multi_parent_prefix = styles["dim"].format(f" [{parent_ids_str}]")
 
         # Print current task with ID prefix and color based on priority
         connector = "└── " if is_last else "├── "
-        task_content = f"{task_id} {description}"
-
-        # Color based on priority, active status, due dates, and waiting status
-        is_active = "start" in task
-        is_waiting = task_uuid in waiting_uuids
-        due_status = is_overdue_or_due_today(task)
+        lines.append(f"{prefix}{connector}{task_content}{multi_parent_prefix}")
 
-        if is_active:
-            task_content = click.style(task_content, fg="bright_green", bold=True)
-        elif due_status in ("overdue", "due_today"):
-            task_content = click.style(task_content, fg="blue")
-        elif is_waiting or priority == "L":
-            task_content = click.style(task_content, fg="bright_black")
-        elif priority == "H":
-            task_content = click.style(task_content, fg="bright_red", bold=True)
-
-        click.echo(f"{prefix}{connector}{task_content}{multi_parent_prefix}")
-
-        # Print children
-        task_children = children.get(task_uuid, [])
-        # Sort children by priority first, then urgency
-        task_children.sort(key=get_sort_key)
-
-        for i, child_uuid in enumerate(task_children):
-            if child_uuid not in visited:
-                is_child_last = i == len(task_children) - 1
-                child_prefix = prefix + ("    " if is_last else "│   ")
-                print_tree(child_uuid, child_prefix, is_child_last, task_uuid)
+        # Queue children (already sorted). They are pushed in reverse so the
+        # first child is popped (and printed) first.
+        child_prefix = prefix + ("    " if is_last else "│   ")
+        last_index = len(task_children) - 1
+        for i in range(last_index, -1, -1):
+            stack.append((task_children[i], child_prefix, i == last_index, node))
 
-    # Print all trees starting from roots
-    for i, root_uuid in enumerate(roots):
-        if root_uuid not in visited:
-            print_tree(root_uuid, "", i == len(roots) - 1)
+    if lines:
+        click.echo("\n".join(lines))
 
 
 @cli.command()
@@ -397,24 +815,17 @@ def chain(task_id: str) -> None:
     """Display ancestor tree from a task upward (tasks blocked by it)"""
 
     # Build task command with context
-    task_cmd: List[str] = ["task"]
-    context_name, context_filter = detect_active_context()
-    if context_name:
-        if context_filter:
-            context_args = shlex.split(context_filter)
-            task_cmd.extend(context_args)
-        else:
-            task_cmd.append(f"rc.context={context_name}")
+    task_cmd, _ = _context_task_command()
 
     # Fetch pending tasks only (no waiting)
     cmd = task_cmd + ["+PENDING", "export"]
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        tasks_data = json.loads(result.stdout)
+        result = subprocess.run(cmd, capture_output=True, check=True)
+        tasks_data = _json_loads(result.stdout)
     except subprocess.CalledProcessError as e:
         click.echo("Error: Failed to run task export", err=True)
-        click.echo(f"stderr: {e.stderr}", err=True)
+        click.echo(f"stderr: {e.stderr.decode('utf-8', 'replace')}", err=True)
         return
     except FileNotFoundError:
         click.echo(
@@ -429,15 +840,17 @@ def chain(task_id: str) -> None:
         click.echo("No pending tasks found.")
         return
 
-    # Build task lookup
+    # Build task lookup and per-task sort keys
     tasks = {task["uuid"]: task for task in tasks_data}
+    sort_keys = {uuid: _task_sort_key(task) for uuid, task in tasks.items()}
 
     # Find the root task by ID or UUID
-    root_uuid = None
-    for task in tasks_data:
-        if str(task.get("id")) == task_id or task.get("uuid") == task_id:
-            root_uuid = task["uuid"]
-            break
+    uuid_by_id = {
+        str(task["id"]): task["uuid"]
+        for task in tasks_data
+        if task.get("id") is not None
+    }
+    root_uuid = uuid_by_id.get(task_id) or (task_id if task_id in tasks else None)
 
     if not root_uuid:
         click.echo(f"Error: Task '{task_id}' not found in pending tasks.", err=True)
@@ -445,48 +858,62 @@ def chain(task_id: str) -> None:
 
     # Build parent relationships
     # parents[uuid] = list of tasks that depend on uuid (tasks that uuid blocks)
-    parents: Dict[str, List[str]] = defaultdict(list)
+    parent_lists: Dict[str, List[str]] = {}
     for task in tasks_data:
         if "depends" in task:
             for dependency_uuid in task["depends"]:
                 if dependency_uuid in tasks:
-                    parents[dependency_uuid].append(task["uuid"])
+                    parent_lists.setdefault(dependency_uuid, []).append(task["uuid"])
 
-    # Sort helper
-    def get_sort_key(uuid: str) -> Tuple[int, float]:
-        task = tasks[uuid]
-        priority = task.get("priority", "")
-        urgency_value = task.get("urgency", 0)
-        try:
-            urgency = float(urgency_value)
-        except (TypeError, ValueError):
-            urgency = 0.0
-        priority_order = {"H": 4, "M": 3, "L": 2, "": 1}
-        return (priority_order.get(priority, 0), urgency)
+    # Sort each parent list once (priority, then urgency, both descending) so
+    # the walk never re-sorts
+    parents: Dict[str, Tuple[str, ...]] = {
+        task_uuid: tuple(sorted(parent_list, key=sort_keys.__getitem__, reverse=True))
+        for task_uuid, parent_list in parent_lists.items()
+    }
+
+    styles = _style_templates()
 
     # Print the root task first (cyan)
     root_task = tasks[root_uuid]
     root_id = root_task.get("id", "?")
     root_desc = root_task["description"]
-    root_content = click.style(f"{root_id} {root_desc}", fg="cyan", bold=True)
-    click.echo()
-    click.echo(root_content)
-
-    def print_ancestors(
-        task_uuid: str,
-        prefix: str = "",
-        is_last: bool = True,
-        path: Set[str] | None = None,
-        is_branching: bool = False,
-    ) -> None:
-        if path is None:
-            path = set()
+    root_content = styles["root"].format(f"{root_id} {root_desc}")
+    lines: List[str] = ["", root_content]
+
+    # Reference time for due date styling, shared by every task
+    now_iso = datetime.now(timezone.utc).strftime(_TASK_DATE_FORMAT)
+
+    # Walk ancestors depth-first using an explicit stack, starting from the
+    # root's parents. Each entry carries the set of tasks on its branch so
+    # cycles can be detected per path. An entry with no path marks the point
+    # where a task's whole ancestor tree has been printed.
+    # Stack entries: (task_uuid, prefix, is_last, path, is_branching)
+    root_parents = parents.get(root_uuid, ())
+    root_branching = len(root_parents) > 1
+
+    # Ancestors already rendered in full on another branch are printed as a
+    # short stub instead of repeating their whole ancestor tree. A task whose
+    # walk was cut short by a cycle is rendered again, so no edge is hidden.
+    explored: Set[str] = set()
+    cut_short: Set[str] = set()
 
+    root_path: Set[str] = {root_uuid}
+    stack: List[Tuple[str, str, bool, Optional[Set[str]], bool]] = [
+        (parent_uuid, "", i == len(root_parents) - 1, root_path, root_branching)
+        for i, parent_uuid in reversed(list(enumerate(root_parents)))
+    ]
+    while stack:
+        task_uuid, prefix, is_last, path, is_branching = stack.pop()
+        if path is None:
+            if task_uuid not in cut_short:
+                explored.add(task_uuid)
+            continue
         if task_uuid in path:
-            return  # Cycle detected, stop
-
-        # Create new path set for this branch
-        current_path = path | {task_uuid}
+            # Cycle detected, stop. Every task on this branch now has an
+            # incomplete rendering.
+            cut_short.update(path)
+            continue
 
         task = tasks[task_uuid]
         task_id = task.get("id", "?")
@@ -498,27 +925,37 @@ def chain(task_id: str) -> None:
             connector = "└── " if is_last else "├── "
         else:
             connector = ""
+
+        if task_uuid in explored:
+            stub = styles["dim"].format(f"{task_id} {description} […]")
+            lines.append(f"{prefix}{connector}{stub}")
+            continue
+        cut_short.discard(task_uuid)
+
+        # Create new path set for this branch
+        current_path = path | {task_uuid}
+
         task_content = f"{task_id} {description}"
 
         # Style based on priority and active status
         is_active = "start" in task
-        due_status = is_overdue_or_due_today(task)
+        due_status = is_overdue_or_due_today(task, now_iso)
 
         if is_active:
-            task_content = click.style(task_content, fg="bright_green", bold=True)
+            task_content = styles["active"].format(task_content)
         elif due_status in ("overdue", "due_today"):
-            task_content = click.style(task_content, fg="blue")
+            task_content = styles["due"].format(task_content)
         elif priority == "L":
-            task_content = click.style(task_content, fg="bright_black")
+            task_content = styles["dim"].format(task_content)
         elif priority == "H":
-            task_content = click.style(task_content, fg="bright_red", bold=True)
+            task_content = styles["high"].format(task_content)
 
-        click.echo(f"{prefix}{connector}{task_content}")
+        lines.append(f"{prefix}{connector}{task_content}")
 
-        # Print parents (tasks blocked by this task)
-        task_parents = parents.get(task_uuid, [])
-        task_parents_sorted = sorted(task_parents, key=get_sort_key)
-        num_parents = len(task_parents_sorted)
+        # Queue parents (tasks blocked by this task), pushed in reverse so they
+        # are printed in sorted order
+        task_parents = parents.get(task_uuid, ())
+        num_parents = len(task_parents)
         parents_branching = num_parents > 1
 
         # Calculate prefix for parents based on whether WE used a connector
@@ -527,21 +964,20 @@ def chain(task_id: str) -> None:
         else:
             child_prefix = prefix
 
-        for i, parent_uuid in enumerate(task_parents_sorted):
+        stack.append((task_uuid, "", False, None, False))
+        for i in range(num_parents - 1, -1, -1):
             is_parent_last = i == num_parents - 1
-            print_ancestors(
-                parent_uuid, child_prefix, is_parent_last, current_path, parents_branching
+            stack.append(
+                (
+                    task_parents[i],
+                    child_prefix,
+                    is_parent_last,
+                    current_path,
+                    parents_branching,
+                )
             )
 
-    # Print ancestors starting from root's parents
-    root_parents = parents.get(root_uuid, [])
-    root_parents_sorted = sorted(root_parents, key=get_sort_key)
-    root_branching = len(root_parents_sorted) > 1
-
-    root_path: Set[str] = {root_uuid}
-    for i, parent_uuid in enumerate(root_parents_sorted):
-        is_last = i == len(root_parents_sorted) - 1
-        print_ancestors(parent_uuid, "", is_last, root_path, root_branching)
+    click.echo("\n".join(lines))
 
 
 if __name__ == "__main__":